@@ -9,14 +9,22 @@ __email__ = 'dieter.vansteenwegen@vliz.be'
 __project__ = 'Panthyr'
 __project_link__ = 'https://waterhypernet.org/equipment/'
 
+import asyncio
+import collections
 import contextlib
+import functools
 import logging
-import select
+import selectors
 import socket as sckt
+import struct
 import time
+from typing import Deque, Optional, Tuple
 
 from .d48e_exceptions import PTHeadConnectionError, PTHeadReplyTimeout
 
+# TCP_QUICKACK is Linux only
+HAS_TCP_QUICKACK = hasattr(sckt, 'TCP_QUICKACK')
+
 
 def initialize_logger() -> logging.Logger:
     """Set up logger
@@ -29,10 +37,26 @@ def initialize_logger() -> logging.Logger:
     return logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=256)
+def _encode_cmd(command: str) -> bytes:
+    """Add <CR> to command and convert to bytes.
+
+    Results are cached, as the head is sent the same small set of commands over and over.
+
+    Args:
+        command (str): command to be encoded
+
+    Returns:
+        bytes: encoded command, including <CR>
+    """
+    return f'{command}\r'.encode('ascii')
+
+
 class PTHeadConnection:
     """Base class for connection to the head."""
 
-    pass
+    # True if write/read_reply are available, to have multiple commands in flight
+    supports_pipelining = False
 
 
 class PTHeadIPConnection(PTHeadConnection):
@@ -41,22 +65,45 @@ class PTHeadIPConnection(PTHeadConnection):
     Provides functions to connect to the pan/tilt head over Ethernet
     """
 
+    supports_pipelining = True
+
     PTU_IP = '192.168.100.105'
     PTU_PORT = 4000
     TIMEOUT_SOCKET = 10
-
-    def __init__(self, ip: str = PTU_IP, port: int = PTU_PORT, timeout: int = TIMEOUT_SOCKET):
+    RX_BUFFER_SIZE = 4096
+    SOCKET_BUFFER_SIZE = 4096
+
+    def __init__(
+        self,
+        ip: str = PTU_IP,
+        port: int = PTU_PORT,
+        timeout: int = TIMEOUT_SOCKET,
+        low_latency: bool = True,
+    ):
         """__init__ for class
 
         Args:
             ip (str, optional): IP address of p/t head. Defaults to PTU_IP.
             port (int, optional): socket number. Defaults to PTU_PORT.
             timeout (int, optional): timeout for socket connection. Defaults to TIMEOUT_SOCKET.
+            low_latency (bool, optional): start in low latency mode,
+                see set_low_latency_mode. Defaults to True.
         """
         self.ip = ip
         self.port = port
         self.timeout = timeout
         self.log = initialize_logger()
+        self.low_latency = low_latency
+        # reusable receive buffer, avoids allocating a new bytes object per recv
+        self._rx_buf = bytearray(self.RX_BUFFER_SIZE)
+        self._rx_view = memoryview(self._rx_buf)
+        # received data following the last reply that was returned
+        self._rx_residual = bytearray()
+        self._sel = None
+        # number of commands sent with write for which the reply has not been read yet
+        self._pending = 0
+        # commands buffered by write, not yet sent
+        self._tx_buf = bytearray()
         self.connect()
 
     def connect(self) -> None:
@@ -68,27 +115,57 @@ class PTHeadIPConnection(PTHeadConnection):
             raise PTHeadConnectionError(msg) from None
         else:
             self._set_socket_options()
+            # register once, instead of building a new fd set for every readiness check
+            self._sel = selectors.DefaultSelector()
+            self._sel.register(self.socket, selectors.EVENT_READ)
             self._empty_rcv_socket()
             self.log.debug('Socket set up.')
 
+    def close(self) -> None:
+        """Close the socket connection and its selector."""
+        if self._sel:
+            self._sel.close()
+            self._sel = None
+        if self.socket:
+            self.socket.close()
+            self.socket = None
+        self._rx_residual.clear()
+        self._tx_buf.clear()
+        self._pending = 0
+
+    def _check_connected(self) -> None:
+        """Raise if the connection is closed, for example after a failed reconnect.
+
+        Raises:
+            PTHeadConnectionError: if not connected
+        """
+        if self._sel is None:
+            msg = 'Not connected to pan/tilt head, call connect first.'
+            raise PTHeadConnectionError(msg)
+
     def _set_socket_options(self) -> None:
         """Perform additional configuration on the socket
 
-        Enable Nagle's Algorithm (bundle smaller chunks of data for delivery into one big packet).
-        Nagle should be disabled according to manual, but experiencing much less network stack hangs
-            on the head if enabled...
+        In low latency mode, disables Nagle's algorithm (TCP_NODELAY), so every command
+            is put on the wire immediately, as the manual recommends.
+        Otherwise Nagle stays enabled (small chunks of data are bundled into one packet),
+            which was experienced to cause less network stack hangs on the head.
         Enables keepalive packets.
         Starts sending keepalive packets after 10 idle seconds.
-        Send a packet every 10 seconds.
+        Send a packet every 5 seconds, connection is dropped after 3 unanswered packets
+            (a dead head is detected within 25 seconds).
+        Sets kernel receive/send buffer sizes explicitly, small as replies are only a few bytes.
+        In low latency mode, enables quick ACK mode (if available), so replies from the head
+            are acknowledged immediately instead of waiting for the delayed ACK timer.
+        Socket is set to non-blocking, so reads return immediately if no data is waiting.
         """
         if self.socket:
-            self.socket.settimeout(3)
-            # self.socket.setblocking(0)
+            self.socket.setblocking(False)
             self.socket.setsockopt(
                 sckt.IPPROTO_TCP,
                 sckt.TCP_NODELAY,
-                1,
-            )  # enable Nagle's algorithm (contrary to what manual recommends!)
+                int(self.low_latency),
+            )  # disable Nagle's algorithm in low latency mode
             self.socket.setsockopt(
                 sckt.SOL_SOCKET,
                 sckt.SO_KEEPALIVE,
@@ -102,7 +179,61 @@ class PTHeadIPConnection(PTHeadConnection):
             self.socket.setsockopt(
                 sckt.IPPROTO_TCP,
                 sckt.TCP_KEEPINTVL,
-                10,
+                5,
+            )
+            self.socket.setsockopt(
+                sckt.IPPROTO_TCP,
+                sckt.TCP_KEEPCNT,
+                3,
+            )
+            self.socket.setsockopt(
+                sckt.SOL_SOCKET,
+                sckt.SO_RCVBUF,
+                self.SOCKET_BUFFER_SIZE,
+            )
+            self.socket.setsockopt(
+                sckt.SOL_SOCKET,
+                sckt.SO_SNDBUF,
+                self.SOCKET_BUFFER_SIZE,
+            )
+            if self.log.isEnabledFor(logging.DEBUG):
+                self.log.debug(
+                    'Socket buffers: rcv %s, snd %s',
+                    self.socket.getsockopt(sckt.SOL_SOCKET, sckt.SO_RCVBUF),
+                    self.socket.getsockopt(sckt.SOL_SOCKET, sckt.SO_SNDBUF),
+                )
+            self._set_quickack()
+
+    def set_low_latency_mode(self, enabled: bool) -> None:
+        """Enable or disable low latency mode.
+
+        In low latency mode, every command is put on the wire immediately (TCP_NODELAY) and
+            replies are acknowledged immediately (TCP_QUICKACK, Linux only).
+        This is the TCP counterpart of the low latency mode of USB-serial adapters.
+
+        Args:
+            enabled (bool): True to enable low latency mode
+        """
+        self.low_latency = enabled
+        if self.socket:
+            self.socket.setsockopt(
+                sckt.IPPROTO_TCP,
+                sckt.TCP_NODELAY,
+                int(enabled),
+            )
+            self._set_quickack()
+
+    def _set_quickack(self) -> None:
+        """Enable TCP_QUICKACK on the socket, if in low latency mode.
+
+        The kernel clears this flag again after it has been used,
+            so it needs to be rearmed after each receive.
+        """
+        if HAS_TCP_QUICKACK and self.low_latency:
+            self.socket.setsockopt(
+                sckt.IPPROTO_TCP,
+                sckt.TCP_QUICKACK,
+                1,
             )
 
     def send_and_get(self, command: str, timeout: float, is_retry: bool = False) -> str:
@@ -124,6 +255,7 @@ class PTHeadIPConnection(PTHeadConnection):
             is_retry (bool): set to True if this is the second attempt to send command
 
         Raises:
+            PTHeadConnectionError: if not connected, or the command could not be sent
             PTHeadReplyTimeout: if head does not respond with full line within timeout
             PTHeadIncorrectReply: if the reply is not correct
 
@@ -131,81 +263,211 @@ class PTHeadIPConnection(PTHeadConnection):
             str: reply from head
         """
 
-        self._empty_rcv_socket()
-        self._send_raw(command)
+        # requests and replies are strictly paired, so only drain if there's something to drain
+        # (including replies to pipelined commands that were never read)
+        # commands buffered by write but never flushed are discarded
+        self._check_connected()
+        self._pending = 0
+        self._tx_buf.clear()
+        if self._rx_residual or self._sel.select(0):
+            self._empty_rcv_socket()
+        self._send_raw(_encode_cmd(command))
+
+        # no exception on timeout, retrying is part of the normal flow here
+        success, reply = self._try_get_reply(timeout)
+        if success:
+            return reply
+        err_msg = f'Received [{reply!r}] after {timeout}s'
+        if is_retry:
+            self.log.error(' Retry failed: %s for command "%s"', err_msg, command)
+            raise PTHeadReplyTimeout(err_msg)
+        return self._reset_socket_and_retry(command, err_msg, timeout)
+
+    def write(self, command: str, flush: bool = True) -> None:
+        """Send command without waiting for its reply.
+
+        Together with read_reply, this allows pipelining: the next command can be written
+            before the reply to the previous one has been read.
+        The head replies to each command in order, so every write should be matched by
+            one read_reply.
+        With flush=False, the command is only buffered, so that several commands can be
+            handed to the kernel in one operation by a final write or flush.
+        Stale data is only drained if no replies are outstanding.
+        There is no retry, as it is unknown which of the outstanding commands have been executed.
+
+        Args:
+            command (str): Command to be sent (without <CR>)
+            flush (bool, optional): send buffered commands now. Defaults to True.
+
+        Raises:
+            PTHeadConnectionError: if not connected, or the command could not be sent
+        """
+        self._check_connected()
+        if not self._pending and (self._rx_residual or self._sel.select(0)):
+            self._empty_rcv_socket()
+        self._tx_buf += _encode_cmd(command)
+        self._pending += 1
+        if flush:
+            self.flush()
+
+    def flush(self) -> None:
+        """Send all commands buffered by write.
+
+        Raises:
+            PTHeadConnectionError: if not connected, or the commands could not be sent
+        """
+        self._check_connected()
+        if self._tx_buf:
+            data = bytes(self._tx_buf)
+            self._tx_buf.clear()
+            self._send_raw(data)
+
+    def read_reply(self, timeout: float) -> str:
+        """Get the reply to the oldest outstanding command sent with write.
+
+        Args:
+            timeout (float): reply timeout in seconds
+
+        Raises:
+            PTHeadConnectionError: if not connected
+            PTHeadReplyTimeout: if head does not respond with full line within timeout
 
+        Returns:
+            str: reply, without leading <LF> or ending <CR><LF>
+        """
+        # no reply will come for a command that is still in the buffer
+        self.flush()
         try:
             reply = self._get_reply(timeout)
-        except PTHeadReplyTimeout as e:
-            if is_retry:
-                msg: str = f' Retry failed: {str(e)} for command "{command}"'
-                self.log.error(msg)
-                raise
-            else:
-                return self._reset_socket_and_retry(command, e, timeout)
-        else:
-            return reply
+        except PTHeadReplyTimeout:
+            # replies are out of sync, let the next write drain whatever arrives late
+            self._pending = 0
+            raise
+        if self._pending:
+            self._pending -= 1
+        return reply
+
+    def _reset_socket_and_retry(self, command, reason, timeout):
+        self.log.warning('Resetting socket and retrying head command %s, %s.', command, reason)
+        self.reset()
+        return self.send_and_get(command=command, timeout=timeout, is_retry=True)
+
+    def reset(self) -> None:
+        """Drop the socket connection and reconnect.
+
+        Replies that are still on their way (for example to pipelined commands after a
+            reply timeout) are lost with the old connection, so they can not be mistaken
+            for the reply to a later command.
 
-    def _reset_socket_and_retry(self, command, e, timeout):
-        self.log.warning(f'Resetting socket and retrying head command {command}, {e}.')
-        self.socket.close()
-        time.sleep(0.5)
-        self.socket = None
+        Raises:
+            PTHeadConnectionError: if the connection could not be set up again
+        """
+        if self.socket:
+            # linger on with 0s timeout: close sends RST, so the head tears down the old
+            # connection immediately and there's no need to wait before reconnecting
+            self.socket.setsockopt(sckt.SOL_SOCKET, sckt.SO_LINGER, struct.pack('ii', 1, 0))
+        self.close()
         self.connect()
-        return self.send_and_get(command=command, timeout=timeout, is_retry=True)
 
-    def _empty_rcv_socket(self) -> None:
-        """Empty the receive buffer of the socket."""
-        read_data = ''
+    def drain_until_idle(self, idle_ms: int = 50, max_wait_ms: int = 600) -> None:
+        """Read and discard data until the head has been silent for a while.
+
+        Used to get rid of the welcome message of the head without waiting a fixed time.
+        Waits for data to arrive, then returns as soon as nothing has been received for idle_ms.
+        Never waits longer than max_wait_ms in total.
+
+        Args:
+            idle_ms (int, optional): silence after data (in ms) before returning. Defaults to 50.
+            max_wait_ms (int, optional): maximum total wait time in ms. Defaults to 600.
+
+        Raises:
+            PTHeadConnectionError: if not connected
+        """
+        self._check_connected()
+        deadline = time.monotonic() + max_wait_ms / 1000
+        received = False
 
         while True:
-            read, _, error = select.select([self.socket], [], [self.socket], 0)
-            if error:
-                self.log.warning(f'Error returned from select for socket: [{error}]')
-            if not read:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
                 break
-            read_data = self.socket.recv(1024).decode()
-            if len(read_data) <= 0:
+            wait = min(idle_ms / 1000, remaining) if received else remaining
+            if not self._sel.select(wait) or not self._rx_from_socket():
                 break
-            if 'PAN-TILT' not in read_data:
-                self.log.warning(f'Data left in buffer: [{read_data}]')
+            received = True
+        self._rx_residual.clear()
 
-    def _send_raw(self, command: str) -> None:
-        """Send command over socket
+    def _empty_rcv_socket(self) -> None:
+        """Empty the receive buffer of the socket.
 
-        <CR> character is added at the end of command, and converted to bytes
+        The socket is read in large chunks until the kernel has nothing queued.
+        Chunks are read into the reusable receive buffer, no bytes object is created per read.
+        No readiness check is needed: the socket is non-blocking, so an empty queue
+            raises BlockingIOError.
+        Leftover data (including data buffered after the last reply)
+            is logged once, unless it is the welcome message of the head.
 
-        Args:
-            command (str): command to be sent
+        Raises:
+            PTHeadConnectionError: if the connection was reset or timed out (keepalive)
         """
+        read_data = bytearray(self._rx_residual)
+        self._rx_residual.clear()
 
-        cmd_bytes = f'{command}\r'.encode()
-        msg_len = len(cmd_bytes)
-
-        bytes_sent = 0
-        while bytes_sent < msg_len:
-            _, _, error = select.select([self.socket], [], [], 0.5)
-            if error:
-                err_msg = f'Error checking socket: [{error}]. {self.socket}'
-                raise PTHeadConnectionError(err_msg)
+        while True:
             try:
-                sent = self.socket.send(cmd_bytes[bytes_sent:])
-            except BrokenPipeError:
-                err_msg = 'Broken pipe error.'
-                raise PTHeadConnectionError(err_msg) from None
-            if sent == 0:
-                err_msg = f'Could not send {cmd_bytes[bytes_sent:]!r}, connection closed.'
-                raise PTHeadConnectionError(err_msg)
-            bytes_sent += sent
-            if bytes_sent < msg_len:
-                self.log.info(
-                    f'Not everything was sent in one operation ({msg_len - bytes_sent} bytes '
-                    f'remaining: {cmd_bytes[bytes_sent:]!r})',
-                )
+                n_bytes = self.socket.recv_into(self._rx_view, self.RX_BUFFER_SIZE)
+            except BlockingIOError:
+                break
+            except OSError as e:
+                err_msg = f'Connection to head lost: {e}'
+                raise PTHeadConnectionError(err_msg) from e
+            if not n_bytes:
+                break
+            read_data += self._rx_view[:n_bytes]
+
+        if read_data and b'PAN-TILT' not in read_data:
+            self.log.warning('Data left in buffer: [%s]', read_data.decode(errors='replace'))
+
+    def _send_raw(self, cmd_bytes: bytes) -> None:
+        """Send encoded command(s) over socket
+
+        The data is handed to the kernel in one sendall call.
+
+        Args:
+            cmd_bytes (bytes): command(s) to be sent, encoded and ending with <CR> (see _encode_cmd)
+
+        Raises:
+            PTHeadConnectionError: if the command could not be sent
+        """
+        try:
+            self.socket.sendall(cmd_bytes)
+        except OSError as e:
+            err_msg = f'Could not send {cmd_bytes!r}: {e}'
+            raise PTHeadConnectionError(err_msg) from e
 
     def _get_reply(self, timeout: float) -> str:
         """Get raw reply within timeout.
 
+        See _try_get_reply for the formatting of the reply.
+
+        Args:
+            timeout (float): reply timeout in seconds
+
+        Raises:
+            PTHeadReplyTimeout: full/correct reply not received within timeout
+
+        Returns:
+            str: reply, without leading <LF> or ending <CR><LF>
+        """
+        success, reply = self._try_get_reply(timeout)
+        if not success:
+            err_msg = f'Received [{reply!r}] after {timeout}s'
+            raise PTHeadReplyTimeout(err_msg)
+        return reply
+
+    def _try_get_reply(self, timeout: float) -> Tuple[bool, str]:
+        """Get raw reply within timeout, without raising on timeout.
+
         Formatting:
             Replies start and end with <LF> (0xA, dec 10).
             Successfully executed command:
@@ -220,40 +482,207 @@ class PTHeadIPConnection(PTHeadConnection):
                     <LF>! Illegal Command Entered<CR><LF>
                     <LF>!T!T*<CR><LF>
 
+        Data received after the end of the reply is kept for the next call.
+        On timeout, the partially received data is discarded.
+
         Args:
             timeout (float): reply timeout in seconds
 
+        Returns:
+            Tuple[bool, str]: (True, reply without leading <LF> or ending <CR><LF>) if successful,
+                (False, partially received data) if the full reply was not received within timeout
+        """
+        rx = self._rx_residual
+        deadline = time.monotonic() + timeout
+
+        while True:
+            # reply starts with <LF>, find the first <CR><LF> after it (scan is done in C)
+            if rx and rx[0] == 0x0A:
+                end = rx.find(b'\r\n', 1)
+                if end >= 0:
+                    reply = rx[1:end].decode('ascii')
+                    del rx[: end + 2]
+                    return True, reply
+            remaining = deadline - time.monotonic()
+            # block until data arrives or the remaining time has passed
+            if remaining <= 0 or not self._sel.select(remaining):
+                break
+            chunk = self._rx_from_socket()
+            if not chunk:
+                # socket is readable but empty: connection was closed by the head
+                break
+            rx.extend(chunk)
+        partial = rx.decode(errors='replace')
+        rx.clear()
+        return False, partial
+
+    def _rx_from_socket(self) -> bytes:
+        """Try to read from socket.
+
+        Reads everything the kernel has queued in a single call, into the reusable receive buffer.
+
         Raises:
-            PTHeadIPReplyTimeout: full/correct reply not received within timeout
+            PTHeadConnectionError: if the connection was reset or timed out (keepalive)
 
         Returns:
-            str: reply, without leading <LF> or ending <CR><LF>
+            bytes: received data. Empty if none received.
         """
-        rx = ''
-        orig_timeout = timeout
-
-        while timeout > 0:
-            # check if there's data in the buffer
-            rx += self._rx_from_socket()
-
-            time.sleep(0.01)
-            with contextlib.suppress(IndexError):
-                if rx[0] == '\n' and rx[-2:] == '\r\n':
-                    return rx[1:-2]
-            timeout -= 0.01
-        err_msg = f'Received [{repr(rx)}] after {orig_timeout}s'
-        raise PTHeadReplyTimeout(err_msg)
-
-    def _rx_from_socket(self) -> str:
-        """Try to read from socket.
+        try:
+            n_bytes = self.socket.recv_into(self._rx_view, self.RX_BUFFER_SIZE)
+        except BlockingIOError:
+            return b''
+        except OSError as e:
+            err_msg = f'Connection to head lost: {e}'
+            raise PTHeadConnectionError(err_msg) from e
+        if n_bytes:
+            self._set_quickack()
+        return bytes(self._rx_view[:n_bytes])
+
+
+class PTHeadAsyncIPConnection(PTHeadConnection):
+    """Asyncio IP communication for the flir PTU-D48.
+
+    Commands can be sent concurrently, for example position queries from one task while
+        another one starts moves.
+    The head replies to commands in order, so each reply completes the oldest command
+        that is still waiting.
+    A command is only answered after all earlier ones: queries sent while an 'A' (await)
+        is pending only get their reply once the move is completed.
+    After a reply timeout, replies can no longer be matched to commands:
+        the connection is dropped and connect should be called again.
+    Call (and await) connect before sending commands.
+    """
+
+    PTU_IP = '192.168.100.105'
+    PTU_PORT = 4000
+    TIMEOUT_SOCKET = 10
+
+    def __init__(self, ip: str = PTU_IP, port: int = PTU_PORT, timeout: int = TIMEOUT_SOCKET):
+        """__init__ for class
+
+        Args:
+            ip (str, optional): IP address of p/t head. Defaults to PTU_IP.
+            port (int, optional): socket number. Defaults to PTU_PORT.
+            timeout (int, optional): timeout for socket connection. Defaults to TIMEOUT_SOCKET.
+        """
+        self.ip = ip
+        self.port = port
+        self.timeout = timeout
+        self.log = initialize_logger()
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Future] = None
+        # futures of sent commands, in order, waiting for their reply
+        self._pending_replies: Deque[asyncio.Future] = collections.deque()
+
+    async def connect(self) -> None:
+        """Set up connection and start reading replies in the background.
+
+        Raises:
+            PTHeadConnectionError: if the connection could not be set up
+        """
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.ip, self.port),
+                self.timeout,
+            )
+        except (asyncio.TimeoutError, OSError):
+            msg = f'Problem setting up socket for pan/tilt head ({self.ip}:{self.port})'
+            raise PTHeadConnectionError(msg) from None
+        self._reader_task = asyncio.ensure_future(self._read_replies())
+        self.log.debug('Socket set up.')
+
+    async def close(self) -> None:
+        """Close the connection, failing commands that are still waiting for a reply."""
+        writer = self._writer
+        self._drop_connection(PTHeadConnectionError('Connection closed'))
+        if writer:
+            with contextlib.suppress(OSError):
+                await writer.wait_closed()
+
+    def _drop_connection(self, exc: Exception) -> None:
+        """Stop reading, close the transport and fail the commands waiting for a reply.
+
+        Args:
+            exc (Exception): exception to set on the waiting commands
+        """
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+        self._fail_pending(exc)
+
+    async def send_and_get(self, command: str, timeout: float) -> str:
+        """Send command and wait for its reply.
+
+        Args:
+            command (str): Command to be sent (without <CR>)
+            timeout (float): reply timeout in seconds
+
+        Raises:
+            PTHeadConnectionError: if not connected, or the command could not be sent
+            PTHeadReplyTimeout: if head does not respond within timeout
 
         Returns:
-            str: received characters. Empty string if none received.
+            str: reply, without leading <LF> or ending <CR><LF>
+        """
+        if not self._writer or not self._reader_task or self._reader_task.done():
+            msg = 'Not connected to pan/tilt head, call connect first.'
+            raise PTHeadConnectionError(msg)
+
+        reply = asyncio.get_running_loop().create_future()
+        self._pending_replies.append(reply)
+        try:
+            self._writer.write(_encode_cmd(command))
+            await self._writer.drain()
+        except OSError as e:
+            err_msg = f'Could not send {command!r}: {e}'
+            # nobody waits for the reply to this command, the error is raised here instead
+            if not reply.cancel():
+                reply.exception()  # already failed by the reader, mark as retrieved
+            # connection is broken, fail all other commands waiting for a reply
+            self._drop_connection(PTHeadConnectionError(err_msg))
+            raise PTHeadConnectionError(err_msg) from e
+
+        try:
+            return await asyncio.wait_for(reply, timeout)
+        except asyncio.TimeoutError:
+            err_msg = f'No reply to {command!r} after {timeout}s'
+            # replies can no longer be matched to commands, reconnect required
+            self._drop_connection(PTHeadConnectionError(f'Connection reset: {err_msg}'))
+            raise PTHeadReplyTimeout(err_msg) from None
+
+    async def _read_replies(self) -> None:
+        """Read replies and hand each one to the oldest command waiting for it.
+
+        Runs as a background task until the connection is closed.
+        Lines that do not start with <LF> (such as the welcome message) are not replies,
+            and are ignored.
+        """
+        try:
+            while True:
+                line = await self._reader.readuntil(b'\r\n')  # type: ignore
+                if not line.startswith(b'\n'):
+                    continue
+                reply = line[1:-2].decode('ascii', errors='replace')
+                if not self._pending_replies:
+                    self.log.warning('Unexpected reply from head: [%s]', reply)
+                    continue
+                waiting = self._pending_replies.popleft()
+                if not waiting.done():
+                    waiting.set_result(reply)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, OSError) as e:
+            self._fail_pending(PTHeadConnectionError(f'Connection to head lost: {e}'))
+
+    def _fail_pending(self, exc: Exception) -> None:
+        """Fail all commands that are still waiting for a reply.
+
+        Args:
+            exc (Exception): exception to set on the waiting commands
         """
-        rx_buffer_readout = ''
-        rx_waiting, _, _ = select.select([self.socket], [], [], 0)
-        while len(rx_waiting) > 0:
-            rx_buffer_readout += self.socket.recv(1).decode()
-            rx_waiting, _, _ = select.select([self.socket], [], [], 0)
-            time.sleep(0.01)
-        return rx_buffer_readout
+        while self._pending_replies:
+            waiting = self._pending_replies.popleft()
+            if not waiting.done():
+                waiting.set_exception(exc)
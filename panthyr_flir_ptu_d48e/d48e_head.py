@@ -8,12 +8,15 @@ __email__ = 'dieter.vansteenwegen@vliz.be'
 __project__ = 'Panthyr'
 __project_link__ = 'https://waterhypernet.org/equipment/'
 
+import contextlib
+import functools
 import logging
 import time
-from typing import Dict, List, Union
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
 
 from .d48e_connections import PTHeadIPConnection
 from .d48e_exceptions import (
+    PTHeadConnectionError,
     PTHeadIncorrectReply,
     PTHeadInvalidTargetPosition,
     PTHeadMoveError,
@@ -21,6 +24,27 @@ from .d48e_exceptions import (
     PTHeadReplyTimeout,
 )
 
+_ARCSEC_PER_DEG = 3600.0
+
+# fixed parts of the initialization command list, see PTHead._generate_init_cmd
+_INIT_FIXED_CMDS = ('FT', 'PHL', 'THR', 'PML', 'TMH', 'CEC', 'PA3000', 'TA3000')
+_INIT_RESET_CMDS = ('WTA', 'WPA', 'RS', 'RD')
+_INIT_CONTINUOUS_CMDS = ('PCE',)
+_INIT_LIMIT_CMDS = ('TNU-27999', 'TXU9333', 'PNU-27067', 'PXU27067', 'LU')
+
+# axis reset commands, their replies contain limit errors ('!P'/'!T'), see PTHead._handle_cmd_reply
+_AXIS_RESET_CMDS = frozenset(('RP', 'RT', 'RS'))
+
+# (resolution_pan, resolution_tilt, timestamp) by (ip, port) of the head, shared by all instances
+_RESOLUTION_CACHE: Dict[Tuple[str, int], Tuple[float, float, float]] = {}
+
+
+class Position(NamedTuple):
+    """Position of the head, in steps (int) or degrees (float)."""
+
+    heading: Union[int, float]
+    elevation: Union[int, float]
+
 
 def initialize_logger() -> logging.Logger:
     """Set up logger
@@ -33,6 +57,57 @@ def initialize_logger() -> logging.Logger:
     return logging.getLogger(__name__)
 
 
+def _strip_axis_errs(reply: str) -> str:
+    """Remove pan/tilt axis errors ('!P' and '!T') from reply.
+
+    Args:
+        reply (str): reply from head
+
+    Returns:
+        str: reply without axis errors
+    """
+    return reply.replace('!T', '').replace('!P', '')
+
+
+def _fahrenheit_to_celsius(fahrenheit: str) -> float:
+    """Convert temperature reported by head to degrees Celsius.
+
+    Args:
+        fahrenheit (str): temperature in degrees Fahrenheit, as reported by the head
+
+    Returns:
+        float: temperature in degrees Celsius, rounded to one decimal
+    """
+    return round((float(fahrenheit) - 32) / 1.8, 1)
+
+
+def _invalidate_on_conn_loss(method: Callable) -> Callable:
+    """Decorator for PTHead methods that use the connection to the head.
+
+    The head state (such as the settings applied by initialize) is unknown after losing
+        the connection, so the head is marked as not initialized before the error is raised.
+    The head might have been restarted with a different step mode,
+        so its cached resolution is dropped as well.
+
+    Args:
+        method (Callable): PTHead method to be wrapped
+
+    Returns:
+        Callable: wrapped method
+    """
+
+    @functools.wraps(method)
+    def wrapper(self: 'PTHead', *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        except PTHeadConnectionError:
+            self.initialized = False
+            _RESOLUTION_CACHE.pop(self._resolution_cache_key(), None)
+            raise
+
+    return wrapper
+
+
 class PTHead:
     """
     Main control for the FLIR PTU-D48 pan/tilt head.
@@ -82,6 +157,14 @@ class PTHead:
     TIMEOUT_RST_AXIS = 15
     TIMEOUT_QUERY = 1
     TIMEOUT_ED = 2
+    # commands starting with these might change the position of the head
+    MOVE_CMD_PREFIXES = ('P', 'T', 'R', 'A')
+    # number of commands in flight when sending a batch of commands, see _send_cmd_batch
+    PIPELINE_DEPTH = 2
+    # time (in seconds) the resolution of a head is reused, see _calculate_resolution
+    RESOLUTION_CACHE_TTL = 3600
+    # time (in seconds) voltage and temperatures are reused, see show_parameters
+    PARAMS_CACHE_TTL = 1.5
 
     def __init__(
         self,
@@ -107,25 +190,75 @@ class PTHead:
         self.debug: int = 0
         self.resolution_pan: float = 0
         self.resolution_tilt: float = 0
+        self._steps_per_deg_pan: float = 0
+        self._steps_per_deg_tilt: float = 0
+        # (position, timestamp) of last position query, see enable_pos_cache
+        self._pos_cache: Optional[Tuple[Position, float]] = None
+        self._pos_cache_ttl: float = 0.0
+        # (parameters, timestamp) of last parameter query, see show_parameters
+        self._params_cache: Optional[Tuple[Dict, float]] = None
+        # init command lists by (has_slipring, do_reset), see _generate_init_cmd
+        self._init_cmd_cache: Dict[Tuple[bool, bool], List[str]] = {}
+        # timeouts by two-character command prefix, see _get_timeout
+        self._timeout_table: Dict[str, float] = {
+            'TP': self.TIMEOUT_TILT,
+            'PP': self.TIMEOUT_PAN,
+            'RT': self.TIMEOUT_RST_AXIS,
+            'RP': self.TIMEOUT_RST_AXIS,
+            'RS': self.TIMEOUT_RST_AXIS,
+        }
+
+    def enable_pos_cache(self, ttl: float) -> None:
+        """Serve current_pos from cache if the last query is less than ttl seconds old.
+
+        Useful for callers that poll the position at a high rate.
+        The cache is invalidated by any command that might move the head.
 
-    def initialize(self) -> bool:
+        Args:
+            ttl (float): time to live of the cached position in seconds. 0 disables the cache.
+        """
+        self._pos_cache_ttl = ttl
+        self._pos_cache = None
+
+    @_invalidate_on_conn_loss
+    def initialize(self, force: bool = False) -> bool:
         """Initialize the pan/tilt
 
         Sends list of commands and queries status of pan/tilt.
+        Does nothing if the head is already initialized, unless forced.
+        The head is marked as not initialized when the connection to it is lost.
+
+        Args:
+            force (bool, optional): initialize, even if already initialized. Defaults to False.
 
         Returns:
             bool: True if success
         """
+        if self.initialized and not force:
+            return True
         # head needs a bit of time to display
         # welcome message, which we don't want to parse
-        time.sleep(0.6)
+        self._conn.drain_until_idle(idle_ms=50, max_wait_ms=600)
         # disable host command echo
         self._send_cmd('ED')
 
         self.initialized = False
 
+        # commands with the default timeout are sent together,
+        # commands with a longer timeout (axis reset) on their own
+        # bound methods as locals, saves the attribute lookups on every iteration
+        get_timeout = self._get_timeout
+        send_cmd = self._send_cmd
+        send_cmd_batch = self._send_cmd_batch
+        batch = []
         for cmd in self._generate_init_cmd():
-            self._send_cmd(cmd)
+            if get_timeout(cmd) == self.TIMEOUT_DEFAULT:
+                batch.append(cmd)
+                continue
+            send_cmd_batch(batch)
+            batch = []
+            send_cmd(cmd)
+        send_cmd_batch(batch)
 
         self._calculate_resolution()
         self._get_limits()
@@ -140,9 +273,38 @@ class PTHead:
 
         Results are in arc degrees per position.
         PR and TR queries return the resolution in arc degrees per position.
+        The number of steps per degree is derived from them, for position conversions.
+
+        The resolution only changes with the step mode, which is set during an axis reset.
+        Unless the axes have just been reset, the resolution queried by any instance for the
+            same head in the last RESOLUTION_CACHE_TTL seconds is reused.
+        It is not reused after the connection to the head was lost, see _invalidate_on_conn_loss.
+        """
+        key = self._resolution_cache_key()
+        cached = _RESOLUTION_CACHE.get(key) if key and not self._do_reset else None
+        if cached and time.monotonic() - cached[2] < self.RESOLUTION_CACHE_TTL:
+            self.resolution_pan, self.resolution_tilt = cached[:2]
+        else:
+            pan, tilt = self._send_queries(['PR', 'TR'])
+            self.resolution_pan = float(pan)
+            self.resolution_tilt = float(tilt)
+            if key:
+                _RESOLUTION_CACHE[key] = (
+                    self.resolution_pan,
+                    self.resolution_tilt,
+                    time.monotonic(),
+                )
+        self._steps_per_deg_pan = _ARCSEC_PER_DEG / self.resolution_pan
+        self._steps_per_deg_tilt = _ARCSEC_PER_DEG / self.resolution_tilt
+
+    def _resolution_cache_key(self) -> Optional[Tuple[str, int]]:
+        """Get the key of this head in the resolution cache.
+
+        Returns:
+            Optional[Tuple[str, int]]: (ip, port) of the head, None if connection is not over IP
         """
-        self.resolution_pan = float(self._send_query('PR'))
-        self.resolution_tilt = float(self._send_query('TR'))
+        ip = getattr(self._conn, 'ip', None)
+        return (ip, self._conn.port) if ip else None
 
     def _get_limits(self) -> None:
         # TODO: Check if this is even required.
@@ -198,16 +360,13 @@ class PTHead:
         Returns:
             list: list of commands
         """
+        key = (self.has_slipring, self._do_reset)
+        cached = self._init_cmd_cache.get(key)
+        if cached is not None:
+            return list(cached)
 
         init_cmds = [
-            'FT',
-            'PHL',
-            'THR',
-            'PML',
-            'TMH',
-            'CEC',
-            'PA3000',
-            'TA3000',
+            *_INIT_FIXED_CMDS,
             f'PU{self.PAN_MAX_SPEED}',
             f'TU{self.TILT_MAX_SPEED}',
             f'PS{self.PAN_CONSTANT_SPEED}',
@@ -218,48 +377,42 @@ class PTHead:
 
         if self._do_reset:
             # axis reset and calibration cmds
-            init_cmds.extend(
-                [
-                    'WTA',
-                    'WPA',
-                    'RS',
-                    'RD',
-                ],
-            )
+            init_cmds.extend(_INIT_RESET_CMDS)
 
         # Add commands for either user limits or continuous rotation
         # These should be executed last
-        if self.has_slipring:
-            init_cmds.extend(['PCE'])
-        else:
-            init_cmds.extend(['TNU-27999', 'TXU9333', 'PNU-27067', 'PXU27067', 'LU'])
+        init_cmds.extend(_INIT_CONTINUOUS_CMDS if self.has_slipring else _INIT_LIMIT_CMDS)
 
-        # self._log.debug(f'Commands generated for init: {init_cmds}')
+        # self._log.debug('Commands generated for init: %s', init_cmds)
 
+        self._init_cmd_cache[key] = list(init_cmds)
         return init_cmds
 
-    def _send_core(self, command: str, timeout: float) -> str:
+    @_invalidate_on_conn_loss
+    def _send_core(self, command: str, timeout: float, is_retry: bool = False) -> str:
         """Basic send function
 
-        Clean up command, send with timeout, return reply
+        Send with timeout, return reply.
+        Command should already be clean (uppercase, no surrounding whitespace),
+            public send functions take care of that.
 
         Args:
             command (str): command or query
             timeout (float): timeout for reply
+            is_retry (bool, optional): set to True if this is the second attempt to send command,
+                so the connection does not retry again on timeout. Defaults to False.
 
         Returns:
             str: reply from head
         """
-        command = command.upper().strip()
-
         try:
-            return self._conn.send_and_get(command, timeout)
+            return self._conn.send_and_get(command, timeout, is_retry=is_retry)
         except PTHeadReplyTimeout:
-            self._log.error(f'Timeout (>{timeout}) for command {command}. ')
+            self._log.error('Timeout (>%s) for command %s. ', timeout, command)
             raise
 
     def send_cmd(self, command: str, timeout: Union[float, None] = None) -> None:
-        """Sends command, but only if head is initialized
+        """Clean up and send command, but only if head is initialized
 
         Args:
             command (str): command to be sent
@@ -274,8 +427,38 @@ class PTHead:
         if not self.initialized:
             msg = 'Head is not yet initialized, call initialize function first.'
             raise PTHeadNotInitialized(msg)
+        command = command.upper().strip()
+        if command.startswith('W'):
+            # step mode changes the resolution, don't reuse it on the next initialize
+            _RESOLUTION_CACHE.pop(self._resolution_cache_key(), None)
         return self._send_cmd(command, timeout)
 
+    def send_cmds(self, commands: List[str]) -> None:
+        """Clean up and send multiple commands, but only if head is initialized
+
+        Commands are pipelined, saving a round trip per command.
+        If the connection does not support pipelining, commands are sent one at a time.
+        Each reply is checked with the timeout for its command.
+
+        Args:
+            commands (List[str]): commands to be sent
+
+        Raises:
+            PTHeadNotInitialized: If head is not yet initialized
+        """
+        if not self.initialized:
+            msg = 'Head is not yet initialized, call initialize function first.'
+            raise PTHeadNotInitialized(msg)
+        commands = [command.upper().strip() for command in commands]
+        if any(command.startswith('W') for command in commands):
+            # step mode changes the resolution, don't reuse it on the next initialize
+            _RESOLUTION_CACHE.pop(self._resolution_cache_key(), None)
+        if not self._conn.supports_pipelining:
+            for command in commands:
+                self._send_cmd(command)
+            return
+        self._send_cmd_batch(commands)
+
     def _send_cmd(self, command: str, timeout: Union[float, None] = None) -> None:
         """Send command to head and check reply
 
@@ -293,22 +476,97 @@ class PTHead:
         """
         if not timeout:
             timeout = self._get_timeout(command)
+        if command.startswith(self.MOVE_CMD_PREFIXES):
+            self._pos_cache = None
 
         reply = self._send_core(command, timeout)
+        self._handle_cmd_reply(command, reply)
+
+    @_invalidate_on_conn_loss
+    def _send_cmd_batch(self, commands: List[str]) -> None:
+        """Send multiple commands to head, pipelined, and check all replies
+
+        Up to PIPELINE_DEPTH commands are in flight: the next command is written as soon as
+            the reply to a previous one has been read and checked, so the head does not have
+            to wait for the host between commands.
+        Each reply is checked with the timeout for its command.
+        An incorrect reply raises an error. The PIPELINE_DEPTH - 1 commands already in flight
+            can not be recalled, but their replies are read before raising.
+        On a reply timeout, the connection is reset and the command is sent once more
+            (the pipelined attempt counts as the first try).
+            The commands after it are sent one at a time, with the retry of send_cmd.
+            Replies do not refer to their command: if the head ignores a command,
+            the missing reply only shows up as a timeout on a later command.
+
+        Args:
+            commands (List[str]): commands to be sent
+        """
+        if not commands:
+            return
+        if any(command.startswith(self.MOVE_CMD_PREFIXES) for command in commands):
+            self._pos_cache = None
+
+        # bound methods as locals, saves the attribute lookups on every iteration
+        write = self._conn.write
+        read_reply = self._conn.read_reply
+        get_timeout = self._get_timeout
+        handle_cmd_reply = self._handle_cmd_reply
+        depth = self.PIPELINE_DEPTH
+        n_commands = len(commands)
+        for command in commands[:depth]:
+            write(command, flush=False)
+        self._conn.flush()
+
+        for i, command in enumerate(commands):
+            timeout = get_timeout(command)
+            try:
+                reply = read_reply(timeout)
+            except PTHeadReplyTimeout:
+                self._reset_after_pipeline_timeout(command, timeout)
+                handle_cmd_reply(command, self._send_core(command, timeout, is_retry=True))
+                for unconfirmed in commands[i + 1 :]:
+                    self._send_cmd(unconfirmed)
+                return
+            try:
+                handle_cmd_reply(command, reply)
+            except PTHeadIncorrectReply:
+                # collect the replies to the commands in flight, to keep replies in sync
+                for in_flight in commands[i + 1 : i + depth]:
+                    with contextlib.suppress(PTHeadReplyTimeout):
+                        read_reply(get_timeout(in_flight))
+                raise
+            # only write the next command once this reply is known to be correct
+            if i + depth < n_commands:
+                write(commands[i + depth])
+
+    def _handle_cmd_reply(self, command: str, reply: str) -> None:
+        """Check the reply to a command
+
+        For axis reset operations, '!T' and '!P' parts of the reply are ignored.
+
+        Args:
+            command (str): command that was sent
+            reply (str): reply from head
+
+        Raises:
+            PTHeadIncorrectReply: an incorrect reply was received.
+        """
         if self.debug:
             print(f'reply from command "{command}": "{reply}"')
 
         # expect error messages if command is a reset axis command
-        expect_limit_err = command.upper() in {
-            'RP',
-            'RT',
-            'RS',
-        }
+        expect_limit_err = command in _AXIS_RESET_CMDS
 
         try:
             self._check_cmd_reply(reply, expect_limit_err)
         except PTHeadIncorrectReply:
-            self._log.exception(f'Incorrect reply "{reply}" for command "{command}"')
+            # traceback only when debugging, the exception is re-raised to the caller anyway
+            self._log.error(
+                'Incorrect reply "%s" for command "%s"',
+                reply,
+                command,
+                exc_info=self._log.isEnabledFor(logging.DEBUG),
+            )
             raise
 
     def _check_cmd_reply(self, reply: str, expect_limit_err: bool):
@@ -325,11 +583,10 @@ class PTHead:
             PTHeadIncorrectReply: an incorrect reply was received.
         """
 
+        if reply == '*':
+            return
         if expect_limit_err:
-            # get rid of '!P' and '!T'
-            import re
-
-            reply = re.sub('!T|!P', '', reply)
+            reply = _strip_axis_errs(reply)
         if reply != '*':
             raise PTHeadIncorrectReply
 
@@ -342,24 +599,17 @@ class PTHead:
         Returns:
             float: timeout value in seconds
         """
-        if command.startswith('TP'):
-            return self.TIMEOUT_TILT
-        if command == 'ED':
-            return self.TIMEOUT_ED
-        if command.startswith('PP'):
-            return self.TIMEOUT_PAN
+        timeout = self._timeout_table.get(command[:2])
+        if timeout is not None:
+            return timeout
         if command == 'A':
             return self.TIMEOUT_PAN
-        if command[:2] in [
-            'RT',
-            'RP',
-            'RS',
-        ]:
-            return self.TIMEOUT_RST_AXIS
+        if command == 'ED':
+            return self.TIMEOUT_ED
         return self.TIMEOUT_DEFAULT
 
     def send_query(self, query: str) -> str:
-        """Sends query, but only if head is initialized
+        """Clean up and send query, but only if head is initialized
 
         Args:
             query (str): query to be sent
@@ -373,7 +623,7 @@ class PTHead:
         if not self.initialized:
             msg = 'Head is not yet initialized, call initialize function first.'
             raise PTHeadNotInitialized(msg)
-        return self._send_query(query)
+        return self._send_query(query.upper().strip())
 
     def _send_query(self, query: str) -> str:
         """Send query to head and return (clean) reply
@@ -391,6 +641,76 @@ class PTHead:
         reply = self._send_core(query, self.TIMEOUT_QUERY)
         return self._check_query_reply(reply)
 
+    def _send_queries(self, queries: List[str]) -> List[str]:
+        """Send multiple queries to head in one round trip and return (clean) replies
+
+        If the connection does not support pipelining, queries are sent one at a time.
+        Uses TIMEOUT_QUERY as timeout for each reply.
+
+        Args:
+            queries (List[str]): queries to be sent
+
+        Returns:
+            List[str]: clean replies, in the order of the queries
+        """
+        if not self._conn.supports_pipelining:
+            return [self._send_query(query) for query in queries]
+
+        replies = self._send_pipelined(queries, [self.TIMEOUT_QUERY] * len(queries))
+        return [self._check_query_reply(reply) for reply in replies]
+
+    @_invalidate_on_conn_loss
+    def _send_pipelined(self, commands: List[str], timeouts: List[float]) -> List[str]:
+        """Send multiple commands/queries to head in one round trip and return raw replies
+
+        All commands are sent in one operation, before the first reply is read.
+        Replies are not checked, but all of them are read, so the caller can check them
+            without getting replies out of sync.
+        On a reply timeout, the connection is reset and the command is sent once more
+            (the pipelined attempt counts as the first try).
+            The commands after it are sent one at a time, with the retry of send_and_get.
+            Commands should be safe to send twice (queries, absolute moves, await).
+        Connection should support pipelining.
+
+        Args:
+            commands (List[str]): commands and/or queries to be sent
+            timeouts (List[float]): timeout for the reply to each command
+
+        Returns:
+            List[str]: raw replies, in the order of the commands
+        """
+        # hand all commands to the kernel in one operation
+        for command in commands:
+            self._conn.write(command, flush=False)
+        self._conn.flush()
+        replies = []
+        for i, (command, timeout) in enumerate(zip(commands, timeouts)):
+            try:
+                replies.append(self._conn.read_reply(timeout))
+            except PTHeadReplyTimeout:
+                self._reset_after_pipeline_timeout(command, timeout)
+                replies.append(self._send_core(command, timeout, is_retry=True))
+                replies.extend(map(self._send_core, commands[i + 1 :], timeouts[i + 1 :]))
+                break
+        return replies
+
+    def _reset_after_pipeline_timeout(self, command: str, timeout: float) -> None:
+        """Reset the connection after a reply timeout, before sending pipelined commands again
+
+        Replies to commands that were in flight are lost with the old connection,
+            so they can not be mistaken for the replies to the commands sent next.
+
+        Args:
+            command (str): command for which the reply timed out
+            timeout (float): timeout for that command
+        """
+        self._log.warning(
+            'Timeout (>%s) for pipelined command %s, retrying it and resending the next ones.',
+            timeout,
+            command,
+        )
+        self._conn.reset()
+
     def _check_query_reply(self, reply: str) -> str:
         """Check reply, raising error if incorrect
 
@@ -419,24 +739,24 @@ class PTHead:
             - 97 is the pan temperature (in Fahrenheit)
             - 104 is the tilt temperature (in Fahrenheit)
 
+        These values change slowly, so a query less than PARAMS_CACHE_TTL seconds old is reused.
+
         Returns:
             Dict: contains elements 'voltage', 'temp_head', 'temp_pan', 'temp_tilt'
                 values rounded to one decimal.
         """
-        dict_rtn = {}
-
-        voltage, *temps = self._send_query('O').split(',')
-        dict_rtn['voltage'] = float(voltage)
-
-        def _f_to_c(f: str) -> float:
-            c = (float(f) - 32) / 1.8
-            return round(c, 1)
-
-        dict_rtn['temp_head'] = _f_to_c(temps[0])  # type: ignore
-        dict_rtn['temp_pan'] = _f_to_c(temps[1])  # type: ignore
-        dict_rtn['temp_tilt'] = _f_to_c(temps[2])  # type: ignore
-
-        return dict_rtn
+        if self._params_cache and time.monotonic() - self._params_cache[1] < self.PARAMS_CACHE_TTL:
+            return dict(self._params_cache[0])
+
+        voltage, head, pan, tilt = self._send_query('O').split(',')
+        params = {
+            'voltage': float(voltage),
+            'temp_head': _fahrenheit_to_celsius(head),
+            'temp_pan': _fahrenheit_to_celsius(pan),
+            'temp_tilt': _fahrenheit_to_celsius(tilt),
+        }
+        self._params_cache = (params, time.monotonic())
+        return dict(params)
 
     def pan_degrees(self):
         """Pan relative amount.
@@ -466,74 +786,129 @@ class PTHead:
         """Move the head to a specific heading and/or elevation.
 
         Setting either heading or elevation to None will not move that axis.
+        The reply to each axis command is checked before the next one is sent:
+            if the head rejects the heading, the elevation is not changed either.
 
         Args:
             heading (Union[None, float], optional): heading in degs, -180 -> 180 . Default None.
             elevation (Union[None, float], optional): elevation in degs, -30 -> 90. Default None.
         """
+        if not self.initialized:
+            msg = 'Head is not yet initialized, call initialize function first.'
+            raise PTHeadNotInitialized(msg)
         target_pos = self._convert_pos_to_steps(heading, elevation)
         commands = self._generate_move_cmds(target_pos)
 
-        for cmd in commands:
+        if self._conn.supports_pipelining:
+            cur_pos = self._move_and_get_pos(commands)
+        else:
+            for cmd in commands:
+                self._send_cmd(cmd)
+            cur_pos = self.current_pos()
+
+        return self._check_correct_position(target_pos, cur_pos)
+
+    def _move_and_get_pos(self, commands: List[str]) -> Position:
+        """Send move commands and query the resulting position
+
+        The axis commands are sent one at a time and each reply is checked before the next
+            command is sent, so a rejected target for one axis does not move the other axis.
+        The position queries are sent right behind the final 'A' (await), in one round trip.
+        The head only replies to the queries once the move is completed.
+        Connection should support pipelining.
+
+        Args:
+            commands (List[str]): move commands, as generated by _generate_move_cmds
+
+        Returns:
+            Position: heading and elevation in steps, after the move
+        """
+        self._pos_cache = None
+        *axis_cmds, await_cmd = commands
+        for cmd in axis_cmds:
             self._send_cmd(cmd)
+        replies = self._send_pipelined(
+            [await_cmd, 'PP', 'TP'],
+            [self._get_timeout(await_cmd), self.TIMEOUT_QUERY, self.TIMEOUT_QUERY],
+        )
 
-        return self._check_correct_position(target_pos)
+        self._handle_cmd_reply(await_cmd, replies[0])
+        pan, tilt = (int(self._check_query_reply(reply)) for reply in replies[-2:])
 
-    def _check_correct_position(self, target_pos: List) -> None:
+        pos = Position(pan, tilt)
+        self._pos_cache = (pos, time.monotonic())
+        return pos
+
+    def _check_correct_position(
+        self,
+        target_pos: Tuple[Optional[int], Optional[int]],
+        cur_pos: Position,
+    ) -> None:
         """Check if current position matches the intended/target position.
 
         Set heading or elevation to None to ignore that axis.
 
         Args:
-            target_pos (list): list of [heading,elevation] of where the head should be.
+            target_pos (tuple): (heading, elevation) of where the head should be.
+            cur_pos (Position): where the head is.
 
         Raises:
             PTHeadMoveError: Move was not succesful,
                 one of the axis is not at the correct location.
         """
-        cur_pos = self.current_pos()
-        err_msg = 'target {} position is "{}" but current position is "{}"'
-        err = []
-        if target_pos[0] and (target_pos[0] != cur_pos[0]):
-            err.append(err_msg.format('heading', target_pos[0], cur_pos[0]))
-        if target_pos[1] and (target_pos[1] != cur_pos[1]):
-            err.append(err_msg.format('elevation', target_pos[1], cur_pos[1]))
+        err = [
+            f'target {axis} position is "{target}" but current position is "{cur}"'
+            for axis, target, cur in zip(('heading', 'elevation'), target_pos, cur_pos)
+            if target is not None and target != cur
+        ]
 
         if err:
             msg = 'error during move: ' + ', '.join(err)
             raise PTHeadMoveError(msg)
 
-    def current_pos(self) -> List:
+    def current_pos(self) -> Position:
         """Return current position in steps.
 
+        If enabled (see enable_pos_cache), a recent enough cached position is returned instead.
+
         Returns:
-            list: [heading, elevation] in steps
+            Position: heading and elevation in steps
         """
-        cur_pos = [None, None]
+        if not self.initialized:
+            msg = 'Head is not yet initialized, call initialize function first.'
+            raise PTHeadNotInitialized(msg)
+        if (
+            self._pos_cache_ttl
+            and self._pos_cache
+            and time.monotonic() - self._pos_cache[1] < self._pos_cache_ttl
+        ):
+            return self._pos_cache[0]
 
-        cur_pos[0] = int(self.send_query('PP'))  # type: ignore
-        cur_pos[1] = int(self.send_query('TP'))  # type: ignore
+        pan_str, tilt_str = self._send_queries(['PP', 'TP'])
+        pos = Position(int(pan_str), int(tilt_str))
 
-        return cur_pos
+        self._pos_cache = (pos, time.monotonic())
+        return pos
 
-    def current_pos_deg(self) -> List:
+    def current_pos_deg(self) -> Position:
         """Return current position in degrees.
 
         Returns:
-            list: [heading, elevation] in degrees
+            Position: heading and elevation in degrees
         """
-        pos_steps = self.current_pos()
-        print(pos_steps)
-        rtn: List = [None, None]
-        rtn[0] = round((pos_steps[0] * self.resolution_pan) / 3600, 1)
-        rtn[1] = round((pos_steps[1] * self.resolution_tilt) / 3600, 1)
-        return rtn
+        pan, tilt = self.current_pos()
+        if self.debug:
+            self._log.debug('pos_steps=(%s, %s)', pan, tilt)
+        return Position(
+            round((pan * self.resolution_pan) / _ARCSEC_PER_DEG, 1),
+            round((tilt * self.resolution_tilt) / _ARCSEC_PER_DEG, 1),
+        )
 
     def _convert_pos_to_steps(
         self,
         heading: Union[None, float] = None,
         elevation: Union[None, float] = None,
-    ) -> List:
+    ) -> Tuple[Optional[int], Optional[int]]:
         """Check angular heading/elevation and convert to steps.
 
         Args:
@@ -541,27 +916,21 @@ class PTHead:
             elevation (Union[None, float], optional): elevation in degrees, -30 -> 90. Default None.
 
         Returns:
-            list: checked [heading,elevation] in steps
+            tuple: checked (heading, elevation) in steps, None for an axis that is not given
         """
+        return (
+            None if heading is None else self._check_and_convert_hdg(heading),
+            None if elevation is None else self._check_and_convert_elevation(elevation),
+        )
 
-        target_pos: List[Union[None, int]] = [None, None]
-
-        if heading is not None:
-            # Verify and convert heading to head steps
-            target_pos[0] = self._check_and_convert_hdg(heading)
-
-        if elevation is not None:
-            target_pos[1] = self._check_and_convert_elevation(elevation)
-        return target_pos
-
-    def _generate_move_cmds(self, target_pos: List) -> List[str]:
+    def _generate_move_cmds(self, target_pos: Tuple[Optional[int], Optional[int]]) -> List[str]:
         """Generate a list of commands to move to the target position and wait.
 
         Generates commands for pan/tilt movement (if target position is not None),
                 then adds 'A' to wait after the last axis command.
 
         Args:
-            target_pos (list): target position [heading, elevation] in steps.
+            target_pos (tuple): target position (heading, elevation) in steps.
 
         Returns:
             list[str]: list of commands
@@ -598,23 +967,19 @@ class PTHead:
         if self.debug:
             print(f'input for _check_and_convert_hdg = {heading}')
 
-        # No funny business
-        heading = float(heading) % 360
+        # No funny business, wrap to -180 < x <= 180 degrees
+        heading = 180.0 - ((180.0 - float(heading)) % 360.0)
 
-        # check if value is reasonable
-        if not (0 <= heading <= 360):
-            msg = f'{heading} is an invalid heading (should be  0 <= x < 360)'
+        # check if value is reasonable (catches nan/inf)
+        if not (-180 < heading <= 180):
+            msg = f'{heading} is an invalid heading (should be  -180 < x <= 180)'
             raise PTHeadInvalidTargetPosition(msg)
 
-        # convert to +/- 180 degrees
-        if heading > 180:
-            heading -= 360
-
         if self.debug:
             print(f'output hdg for _check_and_convert_hdg = {heading}')
 
-        # calculate steps (resolution is in arcdegrees per step)
-        steps = int(heading * 3600 / self.resolution_pan)
+        # calculate steps
+        steps = int(heading * self._steps_per_deg_pan)
 
         # TODO: check boundaries/user limits
         return steps
@@ -639,8 +1004,8 @@ class PTHead:
             msg = f'{elevation} is an invalid elevation (should be  -90 <= x < 30)'
             raise PTHeadInvalidTargetPosition(msg)
 
-        # calculate steps (resolution is in arcdegrees per step)
-        steps = int(elevation * 3600 / self.resolution_tilt)
+        # calculate steps
+        steps = int(elevation * self._steps_per_deg_tilt)
 
         return steps
 